@@ -0,0 +1 @@
+""" Pytest root config, it makes src the import root (utils, models) for tests as in train.py """
@@ -0,0 +1,97 @@
+""" Smoke tests building sound datasets from short wav files and fetching single items and whole batches """
+import torch
+import numpy as np
+import pytest
+
+from scipy.io import wavfile
+
+from utils.feature_factory import SoundFeatureFactory
+
+SAMPLING_RATE = 16000
+HIVES = ['smrpiclient0', 'smrpiclient1']
+# indices of wav files mixing both hives, see sound_filenames fixture
+BATCH_INDICES = [4, 0, 3, 1]
+FEATURES = {
+    'melspectrogram': {'nfft': 512, 'hop_len': 256, 'mels': 32},
+    'periodogram': {'slice_frequency_start': 0, 'slice_frequency_stop': 2048},
+}
+
+@pytest.fixture
+def sound_filenames(tmp_path):
+    """ Fixture writing one second int32 noise recordings, three for every hive """
+    rng = np.random.default_rng(0)
+    filenames = []
+    for hive in HIVES:
+        directory = tmp_path / f'{hive}_recordings'
+        directory.mkdir()
+        for idx in range(3):
+            filename = directory / f'{hive}-{idx}.wav'
+            wavfile.write(filename, SAMPLING_RATE, (rng.standard_normal((SAMPLING_RATE, 1)) * 2**28).astype(np.int32))
+            filenames.append(str(filename))
+    return filenames
+
+def build_loaders(feature, sound_filenames, features_params):
+    """ Function for building dataloaders with two samples batches and two validation samples """
+    (train_loader, val_loader), _ = SoundFeatureFactory.build_dataloaders(feature, sound_filenames, HIVES, features_params,
+                                                                            batch_size=2, ratio=0.34, num_workers=0)
+    return train_loader, val_loader
+
+def assert_batch_equals_items(dataset, indices):
+    """ Function checking that every item of batch fetched at once is the same as fetched on its own """
+    batch = dataset.__getitems__(indices)
+    assert len(batch) == len(indices)
+    for (features, label), idx in zip(batch, indices):
+        item_features, item_label = dataset[idx]
+        assert label == item_label
+        assert len(features) == len(item_features)
+        for feature, item_feature in zip(features, item_features):
+            assert feature.shape == item_feature.shape
+            assert np.allclose(feature, item_feature, atol=1e-5)
+
+@pytest.mark.parametrize('on_device', [False, True])
+def test_melspectrogram_item_and_batch(sound_filenames, on_device):
+    params = {'melspectrogram': {**FEATURES['melspectrogram'], 'on_device': on_device}}
+    train_loader, val_loader = build_loaders('melspectrogram', sound_filenames, params)
+    dataset = train_loader.dataset.dataset
+    frontend = dataset.get_frontend()
+
+    (feature,), label = dataset[0]
+    if on_device:
+        assert feature.shape == (1, SAMPLING_RATE)
+        feature = frontend(torch.from_numpy(feature[None]))[0].numpy()
+    assert feature.shape == (1, 32, 64)
+    assert label == 0
+    assert_batch_equals_items(dataset, BATCH_INDICES)
+
+    (batch,), labels = next(iter(train_loader))
+    if on_device:
+        batch = frontend(batch)
+    assert tuple(batch.shape) == (2, 1, 32, 64)
+    assert np.allclose(batch.numpy().min(axis=(1, 2, 3)), 0) and np.allclose(batch.numpy().max(axis=(1, 2, 3)), 1)
+    assert set(labels.tolist()) <= {0, 1}
+    assert sum(len(labels) for _, labels in val_loader) == 2
+
+def test_periodogram_item_and_batch(sound_filenames):
+    train_loader, _ = build_loaders('periodogram', sound_filenames, FEATURES)
+    dataset = train_loader.dataset.dataset
+
+    (feature,), label = dataset[len(dataset) - 1]
+    assert feature.shape == (1, 2048)
+    assert label == 1
+    assert_batch_equals_items(dataset, BATCH_INDICES)
+
+    (batch,), labels = next(iter(train_loader))
+    assert tuple(batch.shape) == (2, 1, 2048)
+    assert set(labels.tolist()) <= {0, 1}
+
+@pytest.mark.parametrize('feature', ['melspectrogram', 'periodogram'])
+def test_double_feature_batch(sound_filenames, feature):
+    target_filenames, background_filenames = sound_filenames[:3], sound_filenames[3:]
+    (train_loader, _), _ = SoundFeatureFactory.build_dataloaders(feature, target_filenames, HIVES, FEATURES, batch_size=2,
+                                                                    ratio=0.34, num_workers=0, background_filenames=background_filenames,
+                                                                    background_labels=HIVES)
+    dataset = train_loader.dataset.dataset
+    assert_batch_equals_items(dataset, [2, 0, 1])
+
+    (target_batch, background_batch), _ = next(iter(train_loader))
+    assert target_batch.shape == background_batch.shape
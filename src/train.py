@@ -11,16 +11,26 @@ import traceback
 
 from datetime import datetime
 from utils.data_utils import create_valid_sounds_datalist, get_valid_sounds_datalist
-from utils.feature_factory import SoundFeatureFactory
+from utils.feature_factory import SoundFeatureFactory, SoundFeatureType
 from utils.model_factory import HiveModelFactory
 
 from utils.data_utils import filter_strlist, truncate_lists_to_smaller_size, read_comet_api_key
 
 
+def get_data_shape(train_loader, frontend=None):
+    """ function for getting shape of single data sample, calculated by frontend if dataset returns raw data """
+    sample = train_loader.dataset[0][0][0]
+    if frontend is not None:
+        with torch.no_grad():
+            sample = frontend(torch.as_tensor(sample, device=next(frontend.buffers()).device)[None])[0]
+
+    return sample.squeeze().shape
+
+
 def build_and_train_model(model_type, model_config, train_config: dict, train_loader, val_loader, feature_params_dict, model_output_folder,
-                             use_discriminator=False, discirminator_config=None, comet_tags=[], comet_api_key=None):
+                             use_discriminator=False, discirminator_config=None, comet_tags=[], comet_api_key=None, frontend=None):
     """ function for building and training model """
-    data_shape = train_loader.dataset[0][0][0].squeeze().shape
+    data_shape = get_data_shape(train_loader, frontend)
     logging.info(f'building model with data input shape of {data_shape}')
 
     model, model_params = HiveModelFactory.build_model(model_type, model_config, data_shape)
@@ -37,7 +47,8 @@ def build_and_train_model(model_type, model_config, train_config: dict, train_lo
         log_dict = {**model_params, **disc_params, **feature_params_dict}
         try:
             model = m.train_model(model, train_config, train_loader, val_loader, discriminator=discriminator, \
-                                    comet_params=log_dict, comet_tags=comet_tags, model_output_folder=model_output_folder, comet_api_key=comet_api_key)
+                                    comet_params=log_dict, comet_tags=comet_tags, model_output_folder=model_output_folder, comet_api_key=comet_api_key, \
+                                    frontend=frontend)
             logging.info('model train success!')
         except Exception:
             logging.error('model train fail!')
@@ -91,6 +102,8 @@ def main():
     parser.set_defaults(check_data=False)
 
     args = parser.parse_args()
+    # fail on unsupported feature before reading (and checking) sound files
+    SoundFeatureType.from_name(args.feature)
 
     # read config file
     f = open(args.config_file)
@@ -124,6 +137,8 @@ def main():
     (train_loader, val_loader), fparams_dict = SoundFeatureFactory.build_dataloaders(args.feature, target_filenames, target_labels, 
                                                         config['features'], config['learning'].get('batch_size', 32),
                                                         background_filenames=background_filenames, background_labels=background_labels)
+    # feature frontend for datasets which features are calculated on model device
+    frontend = train_loader.dataset.dataset.get_frontend()
 
     # read comet ml api key from specified file
     comet_api_key = read_comet_api_key(args.comet_config) if args.comet_config else None
@@ -133,7 +148,7 @@ def main():
         for sample_no in range(args.random_search):
             # generate model config 
             if args.model_type.startswith('conv'):
-                model_config = m.generate_conv_model_config(config['random_search']['model']['conv'], train_loader.dataset[0][0][0].squeeze().shape)
+                model_config = m.generate_conv_model_config(config['random_search']['model']['conv'], get_data_shape(train_loader, frontend))
             elif args.model_type != 'discriminator':
                 model_config = m.generate_fc_model_config(config['random_search']['model']['fc'])
             else:
@@ -144,7 +159,8 @@ def main():
             discriminator_config = m.generate_discriminator_model_config(config['random_search']['model']['discriminator']) if args.discriminator else None
 
             build_and_train_model(args.model_type, model_config, train_config, train_loader, val_loader, fparams_dict, args.model_output,
-                                    use_discriminator=args.discriminator, discirminator_config=discriminator_config, comet_tags=log_labels, comet_api_key=comet_api_key)
+                                    use_discriminator=args.discriminator, discirminator_config=discriminator_config, comet_tags=log_labels, comet_api_key=comet_api_key,
+                                    frontend=frontend)
 
     else:
         logging.info(f'single shot {args.model_type} configuration is active.')
@@ -153,7 +169,8 @@ def main():
         discriminator_config = config['model_architecture']['discriminator'] if args.discriminator else None
 
         build_and_train_model(args.model_type, model_config, train_config, train_loader, val_loader, fparams_dict, args.model_output,
-                            use_discriminator=args.discriminator, discirminator_config=discriminator_config, comet_tags=log_labels, comet_api_key=comet_api_key)
+                            use_discriminator=args.discriminator, discirminator_config=discriminator_config, comet_tags=log_labels, comet_api_key=comet_api_key,
+                            frontend=frontend)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
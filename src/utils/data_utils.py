@@ -129,6 +129,31 @@ def _batch_perform(batch_data: torch.Tensor, operation: Callable):
     return batch_data
 
 
+class BatchSubset(tdata.Subset):
+    """ Subset which can be indexed with list of indices, so dataloader with batch sampler fetches whole batch
+    with single dataset __getitems__ call (if dataset implements it), regardless of torch version """
+    def __getitem__(self, idx):
+        if isinstance(idx, list):
+            return self.__getitems__(idx)
+        return self.dataset[self.indices[idx]]
+
+    def __getitems__(self, indices):
+        indices = [self.indices[idx] for idx in indices]
+        if hasattr(self.dataset, '__getitems__'):
+            return self.dataset.__getitems__(indices)
+        return [self.dataset[idx] for idx in indices]
+
+
+def min_max_scale(x, axis=None):
+    """ Function for scaling array (or its slices along axis) to be within 0 and 1,
+    constant values are scaled to zeros as in MinMaxScaler """
+    x_min = x.min(axis=axis, keepdims=True)
+    data_range = x.max(axis=axis, keepdims=True) - x_min
+    data_range[data_range == 0] = 1
+
+    return (x - x_min) / data_range
+
+
 def closest_power_2(x):
     """ Function returning nerest power of two """
     possible_results = math.floor(math.log(x, 2)), math.ceil(math.log(x, 2))
@@ -22,7 +22,6 @@ __status__ = "Development"
 
 from scipy import signal, fftpack
 import numpy as np
-import matplotlib.pyplot as plt
 
 
 def compute_spectrogram(sig, sampling_rate, windowLength=512, windowHop= 256, square=True, windowType='hanning', centered=False, normalized = False ):
@@ -493,6 +492,7 @@ def remove_noiseInSpectro(spectro, histo_relative_size=8, window_smoothing=5, N=
 
     #Figure
     if plot:
+        import matplotlib.pyplot as plt     # plotting is for debug only, keep matplotlib out of dataset imports
         colormap="jet"
         fig = plt.figure()
         a = fig.add_subplot(1,2,1)
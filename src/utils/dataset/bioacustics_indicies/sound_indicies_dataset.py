@@ -1,8 +1,7 @@
-import os
 from enum import Enum
 
 from utils.dataset.spectrogram_dataset import calculate_spectrogram
-from utils.dataset.sound import read_samples
+from utils.dataset.sound import read_samples, get_sound_labels
 from utils.dataset.bioacustics_indicies.compute_indice import compute_ACI, compute_AEI, compute_BI, compute_spectrogram
 
 from torch.utils.data import Dataset
@@ -23,6 +22,7 @@ class SoundIndiciesDataset(Dataset):
         """
         self.filenames = filenames              # sound filenames
         self.labels = hives                     # labels
+        self.sound_labels = get_sound_labels(filenames, hives)
         self.indicator_type = indicator_type    # ACI, ADI, AEI, see SoundIndicator class
 
         # aci related params
@@ -53,6 +53,10 @@ class SoundIndiciesDataset(Dataset):
 
         return params
 
+    def get_frontend(self):
+        """ Function for getting frontend module, indicies are calculated by dataset so there is none """
+        return None
+
     def __getitem__(self, idx):
 
         def get_ACI():
@@ -134,11 +138,7 @@ class SoundIndiciesDataset(Dataset):
 
         # read sound samples from file
         filename = self.filenames[idx]
-        hive_name = filename.split(os.sep)[-2].split("_")[0]
-        try:
-            label = next(index for index, name in enumerate(self.labels) if name == hive_name)
-        except StopIteration as e:
-            label = -1
+        label = int(self.sound_labels[idx])
 
         feature = {
             self.SoundIndicator.ACI:    get_ACI,  
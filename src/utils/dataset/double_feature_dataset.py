@@ -20,11 +20,26 @@ class DoubleFeatureDataset(Dataset):
         """ Function for returning params """
         return self.target.get_params()
 
+    def get_frontend(self):
+        """ Function for returning frontend, the same for target and background """
+        return self.target.get_frontend()
+
     def __getitem__(self, idx):
         # function for returning target, background pair
         target_sample, label = self.target.__getitem__(idx)
         background_sample, _ = self.background.__getitem__(idx)
         return [*target_sample, *background_sample], label
 
+    def __getitems__(self, indices):
+        """ Method for fetching whole batch (see BatchSubset), target and background batches are fetched by
+        their datasets at once """
+        def get_items(dataset):
+            if hasattr(dataset, '__getitems__'):
+                return dataset.__getitems__(indices)
+            return [dataset[idx] for idx in indices]
+
+        return [([*target_sample, *background_sample], label)
+                    for (target_sample, label), (background_sample, _) in zip(get_items(self.target), get_items(self.background))]
+
     def __len__(self):
         return len(self.target) # as we assert len of target and backround at constructor
\ No newline at end of file
@@ -1,19 +1,89 @@
 import os
 import torch
+import inspect
+import functools
 import random 
 import librosa
 import numpy as np
 
 from torch.utils.data import Dataset
 from scipy.io import wavfile
-from sklearn.preprocessing import MinMaxScaler
 
-from utils.dataset.sound import Sound
-from utils.data_utils import adjust_matrix, closest_power_2
+from utils.dataset.sound import Sound, is_stackable
+from utils.data_utils import closest_power_2
+
+# librosa centered stft padding, changed from 'reflect' to 'constant' in librosa 0.9
+LIBROSA_PAD_MODE = inspect.signature(librosa.stft).parameters['pad_mode'].default
+
+@functools.lru_cache(maxsize=32)
+def get_mel_basis(sampling_rate, nfft, mels):
+    """ Function for getting mel filter bank, filter banks are cached so every transform
+    (and experiment run in the same process) with the same params reuse them """
+    return librosa.filters.mel(sr=sampling_rate, n_fft=nfft, n_mels=mels).astype(np.float32)
+
+class MelSpectrogramTransform(torch.nn.Module):
+    """ Torch implementation of librosa melspectrogram followed by power_to_db (ref=np.max) """
+    def __init__(self, sampling_rate, nfft, hop_len, mels, top_db=80.0, pad_mode=LIBROSA_PAD_MODE):
+        """ Constructor for MelSpectrogram transform
+
+        Parameters:
+            sampling_rate (int): sampling rate of transformed sounds
+            nfft (int): how many samples for nfft
+            hop_len (int): overlapping, samples for hop to next fft
+            mels (int): mels
+            top_db (float): threshold for db values below max
+            pad_mode (str): padding mode for centered stft frames, defaults to the one used by installed librosa
+        """
+        super().__init__()
+        self.nfft = nfft
+        self.hop_len = hop_len
+        self.top_db = top_db
+        self.pad_mode = pad_mode
+        self.register_buffer('window', torch.hann_window(nfft))
+        self.register_buffer('mel_basis', torch.from_numpy(get_mel_basis(sampling_rate, nfft, mels)))
+
+    def forward(self, samples):
+        """ Transform sound samples (samples) or batch of them (batch, samples) to melspectrogram db """
+        spectrogram = torch.stft(samples, n_fft=self.nfft, hop_length=self.hop_len, window=self.window, \
+                                    center=True, pad_mode=self.pad_mode, return_complex=True)
+        mel = torch.matmul(self.mel_basis, spectrogram.abs()**2)
+        mel_db = 10.0 * torch.log10(torch.clamp(mel, min=1e-10))
+        mel_db = mel_db - mel_db.amax(dim=(-2, -1), keepdim=True)
+        return torch.clamp(mel_db, min=-self.top_db)
+
+class MelSpectrogramFrontend(torch.nn.Module):
+    """ Melspectrogram frontend calculating scaled melspectrogram features from raw sounds batch on model device """
+    def __init__(self, sampling_rate, nfft, hop_len, mels, truncate_power_two=False):
+        """ Constructor for MelSpectrogram frontend
+
+        Parameters:
+            sampling_rate (int): sampling rate of transformed sounds
+            nfft (int): how many samples for nfft
+            hop_len (int): overlapping, samples for hop to next fft
+            mels (int): mels
+            truncate_power_two (bool): if we should truncate our shape to the nearest power of two
+        """
+        super().__init__()
+        self.transform = MelSpectrogramTransform(sampling_rate, nfft, hop_len, mels)
+        self.truncate = truncate_power_two
+
+    def forward(self, sound_samples):
+        """ Transform sounds batch (batch, 1, samples) to scaled melspectrograms db (batch, 1, mels, frames) """
+        mel = self.transform(sound_samples.squeeze(1))
+        if self.truncate:
+            # pad with zeros or truncate to nearest power of two as adjust_matrix does
+            mels, frames = 2**closest_power_2(mel.shape[-2]), 2**closest_power_2(mel.shape[-1])
+            mel = torch.nn.functional.pad(mel, (0, max(0, frames - mel.shape[-1]), 0, max(0, mels - mel.shape[-2])))
+            mel = mel[..., :mels, :frames]
+
+        mel_min = mel.amin(dim=(-2, -1), keepdim=True)
+        mel_range = mel.amax(dim=(-2, -1), keepdim=True) - mel_min
+        mel_range[mel_range == 0] = 1
+        return ((mel - mel_min) / mel_range).unsqueeze(1)
 
 class MelSpectrogramDataset(Dataset, Sound):
     """ MelSpectrogram dataset """
-    def __init__(self, filenames, hives, nfft, hop_len, mels, truncate_power_two=False):
+    def __init__(self, filenames, hives, nfft, hop_len, mels, truncate_power_two=False, on_device=False):
         """ Constructor for MelSepctrogram Dataset
 
         Parameters:
@@ -23,36 +93,78 @@ class MelSpectrogramDataset(Dataset, Sound):
             hop_len (int): overlapping, samples for hop to next fft
             mels (int): mels
             truncate_power_two (bool): if we should truncate our shape to the nearest power of two
+            on_device (bool): if dataset should return raw sounds and melspectrograms should be calculated
+                                by frontend on model device, see get_frontend method
         """
         Sound.__init__(self, filenames, hives)
         self.nfft = nfft
         self.hop_len = hop_len
         self.mels = mels
         self.truncate = truncate_power_two
+        self.on_device = on_device
+        self.mel_frontends = {}     # melspectrogram frontends per sampling rate, built on first use
 
     def get_params(self):
         """ Function for returning params """
         return {
             'number_of_mels': self.mels,
             'nfft': self.nfft,
-            'hop_len': self.hop_len
+            'hop_len': self.hop_len,
+            'on_device': self.on_device
         }
 
+    def get_frontend(self):
+        """ Function for getting frontend calculating melspectrograms from dataset items on model device
+
+        Returns:
+            frontend (MelSpectrogramFrontend): frontend module or None if dataset returns melspectrograms
+        """
+        if not self.on_device:
+            return None
+
+        _, sampling_rate, _ = Sound.read_sound(self, 0)
+        return MelSpectrogramFrontend(sampling_rate, self.nfft, self.hop_len, self.mels, self.truncate)
+
+    def get_mel_frontend(self, sampling_rate):
+        """ Function for getting melspectrogram frontend for sampling rate, frontend is built once and then reused """
+        if sampling_rate not in self.mel_frontends:
+            self.mel_frontends[sampling_rate] = MelSpectrogramFrontend(sampling_rate, self.nfft, self.hop_len, self.mels, self.truncate)
+        return self.mel_frontends[sampling_rate]
+
+    def compute_melspectrogram(self, sound_samples, sampling_rate):
+        """ Function for calculating scaled melspectrogram db
+
+        Parameters:
+            sound_samples (np.ndarray): sound samples, for 2d array (batch, samples) melspectrogram is calculated per row
+            sampling_rate (int): sampling rate
+
+        Returns:
+            melspectrogram (np.ndarray): melspectrogram (1, mels, frames) or (batch, 1, mels, frames) for batch,
+                                            if dataset is on device there are sound samples (1, samples) returned
+        """
+        if self.on_device:
+            # melspectrogram will be calculated by frontend
+            return sound_samples[..., None, :]
+
+        with torch.no_grad():
+            samples = torch.from_numpy(sound_samples)
+            mel = self.get_mel_frontend(sampling_rate)(samples.reshape(-1, 1, samples.shape[-1]))
+
+        return mel.numpy().reshape(*sound_samples.shape[:-1], *mel.shape[1:])
+
     def __getitem__(self, idx):
         # read sound samples from file
-        sound_samples, sampling_rate, label = Sound.read_sound(self, idx)
-
-        mel = librosa.feature.melspectrogram(y=sound_samples, sr=sampling_rate, \
-                                             n_fft=self.nfft, hop_length=self.hop_len, n_mels=self.mels)
-        mel = librosa.power_to_db(mel, np.max)
-        if self.truncate:
-            mel = adjust_matrix(mel, 2**closest_power_2(mel.shape[0]), 2**closest_power_2(mel.shape[1]))
+        sound_samples, sampling_rate, label = Sound.read_sound(self, idx, dtype='float32')
+        return [self.compute_melspectrogram(sound_samples, sampling_rate)], label
 
-        initial_shape = mel.shape
-        mel_scaled_spectrogram_db = MinMaxScaler().fit_transform(mel.reshape(-1, 1)).reshape((1, *initial_shape))
-        mel_scaled_spectrogram_db = mel_scaled_spectrogram_db.astype(np.float32)
+    def __getitems__(self, indices):
+        """ Method for fetching whole batch (see BatchSubset), melspectrograms are calculated for all sounds at once """
+        sounds = Sound.read_sounds(self, indices, dtype='float32')
+        if not is_stackable(sounds):
+            return [([self.compute_melspectrogram(samples, rate)], label) for samples, rate, label in sounds]
 
-        return [mel_scaled_spectrogram_db], label
+        mels = self.compute_melspectrogram(np.stack([samples for samples, _, _ in sounds]), sounds[0][1])
+        return [([mel], label) for mel, (_, _, label) in zip(mels, sounds)]
  
     def __len__(self):
         return len(self.filenames)
@@ -4,12 +4,48 @@ import random
 import numpy as np
 
 from math import sqrt
+from scipy import fft as sfft
 from torch.utils.data import Dataset
-from scipy.fftpack import fft, fftfreq
-from scipy import signal, fftpack
-from sklearn.preprocessing import MinMaxScaler
 
-from utils.dataset.sound import Sound
+from utils.dataset.sound import Sound, is_stackable
+from utils.data_utils import min_max_scale
+
+try:
+    import pyfftw
+    import pyfftw.interfaces.cache
+    import pyfftw.interfaces.scipy_fft
+except ImportError:
+    pyfftw = None
+
+# pyfftw interfaces cache runs its own thread, so it is enabled by first fftw call in process using it
+# (e.g. dataloader worker) and not at import, cache inherited by forked process is replaced as its thread
+# is not running there and its locks could be held
+_pyfftw_cache_pid = None
+
+def rfft(sound_samples, n, workers=None):
+    """ Function for calculating real input fft along last axis, with fftw if pyfftw is available
+
+    Parameters:
+        sound_samples (np.ndarray): samples, for 2d array (batch, samples) fft is calculated per row
+        n (int): fft length
+        workers (int): number of workers for fft calculation
+
+    Returns:
+        spectrum (np.ndarray): complex spectrum
+    """
+    global _pyfftw_cache_pid
+    if pyfftw is None:
+        return sfft.rfft(sound_samples, n=n, axis=-1, workers=workers)
+
+    if _pyfftw_cache_pid != os.getpid():
+        # every sound is transformed with n=sampling_rate so single cached fftw plan is reused for all items
+        pyfftw.interfaces.cache.disable()
+        pyfftw.interfaces.cache.enable()
+        pyfftw.interfaces.cache.set_keepalive_time(60)
+        _pyfftw_cache_pid = os.getpid()
+
+    # measured plans are slower to build but as the plan is reused for all items it pays off after a few sounds
+    return pyfftw.interfaces.scipy_fft.rfft(sound_samples, n=n, axis=-1, workers=workers, planner_effort='FFTW_MEASURE')
 
 class PeriodogramDataset(Dataset, Sound):
     """ Periodogram dataset """
@@ -29,29 +65,54 @@ class PeriodogramDataset(Dataset, Sound):
         }
         
     def __getitem__(self, idx):
-        """ Method for pytorch dataloader """
-        (periodogram, _), labels = self.get_item(idx)
-        return [periodogram[None, :]], labels
+        """ Method for pytorch dataloader, frequencies are not needed here so only periodogram is calculated """
+        sound_samples, sampling_rate, labels = Sound.read_sound(self, idx=idx, raw=True)
+        return [self.compute_periodogram(sound_samples, sampling_rate)[None, :]], labels
+
+    def __getitems__(self, indices):
+        """ Method for fetching whole batch (see BatchSubset), periodograms are calculated with single fft call """
+        sounds = Sound.read_sounds(self, indices, raw=True)
+        if not is_stackable(sounds):
+            return [([self.compute_periodogram(samples, rate)[None, :]], label) for samples, rate, label in sounds]
+
+        periodograms = self.compute_periodogram(np.stack([samples for samples, _, _ in sounds]), sounds[0][1], workers=-1)
+        return [([periodogram[None, :]], label) for periodogram, (_, _, label) in zip(periodograms, sounds)]
 
     def get_item(self, idx):
-        """ Function for getting periodogram """
+        """ Function for getting periodogram along with its frequencies """
         # read sound samples from file
         sound_samples, sampling_rate, labels = Sound.read_sound(self, idx=idx, raw=True)
 
-        periodogram = abs(np.fft.rfft(sound_samples, sampling_rate))[1:]
+        periodogram = self.compute_periodogram(sound_samples, sampling_rate)
+        frequencies = sfft.rfftfreq(sampling_rate, d=(1./sampling_rate))[1:]
+        if self.slice_freq:
+            frequencies = frequencies[self.slice_freq[0]:self.slice_freq[1]]
+
+        return (periodogram, frequencies), labels
+
+    def compute_periodogram(self, sound_samples, sampling_rate, workers=None):
+        """ Function for calculating periodogram from raw sound samples
+
+        Parameters:
+            sound_samples (np.ndarray): raw sound samples, for 2d array (batch, samples) periodogram is calculated per row
+            sampling_rate (int): sampling rate
+            workers (int): number of workers for fft calculation, used for batches
+
+        Returns:
+            periodogram (np.ndarray): periodogram
+        """
+        # single precision fft instead of float64 promotion of integer samples
+        periodogram = np.abs(rfft(sound_samples.astype(np.float32, copy=False), sampling_rate, workers=workers))[..., 1:]
         if self.scale_db:
-            periodogram = 20*np.log10(periodogram/np.iinfo(sound_samples[0]).max)
-        frequencies = np.fft.rfftfreq(sampling_rate, d=(1./sampling_rate))[1:]
+            periodogram = 20*np.log10(periodogram/np.iinfo(sound_samples.dtype).max)
 
         if self.slice_freq:
-            periodogram = periodogram[self.slice_freq[0]:self.slice_freq[1]]
-            frequencies = frequencies[self.slice_freq[0]:self.slice_freq[1]]
+            periodogram = periodogram[..., self.slice_freq[0]:self.slice_freq[1]]
 
         if self.scale:
-            periodogram = MinMaxScaler().fit_transform(periodogram.reshape(-1, 1)).squeeze()
+            periodogram = min_max_scale(periodogram, axis=-1)
+
+        return periodogram.astype(np.float32, copy=False)
 
-        periodogram = periodogram.astype(np.float32)
-        return (periodogram, frequencies), labels
-        
     def __len__(self):
         return len(self.filenames)
\ No newline at end of file
@@ -3,6 +3,12 @@ import numpy as np
 
 from scipy.io import wavfile
 from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+# number of threads reading sounds of single batch, file reading and pcm conversion release GIL
+READ_WORKERS = 4
+# reading thread pools by process id, pools are not inherited by forked dataloader workers
+_reading_executors = {}
 
 def pcm2float(sig, dtype='float64'):
     """Convert PCM signal to floating point with a range from -1 to 1.
@@ -36,45 +42,88 @@ def pcm2float(sig, dtype='float64'):
     i = np.iinfo(sig.dtype)
     abs_max = 2 ** (i.bits - 1)
     offset = i.min + abs_max
-    return (sig.astype(dtype) - offset) / abs_max
-
-def read_samples(filename, raw=False):
+    # single conversion copy, offset and scale are applied in place
+    samples = sig.astype(dtype)
+    if offset:
+        samples -= offset
+    samples *= dtype.type(1.0 / abs_max)
+    return samples
+
+def read_samples(filename, raw=False, dtype='float64'):
     """ Function for reading sound samples from wav file
     
     Paramters:
         filename (str): file to be read
         raw (bool): set to True if you don't want to scale samples (by max int32)
+        dtype (str): floating point type of scaled samples
 
     Returns
         sound_samples (list(float)): scaled sound samples
         samplint_rate (int): sampling rate for audio
     """
-    sampling_rate, sound_samples = wavfile.read(filename)
+    # memory map pcm data so only the used channel is materialized on conversion
+    sampling_rate, sound_samples = wavfile.read(filename, mmap=True)
 
     if len(sound_samples.shape) > 1:
         # 2-channel recording
-        sound_samples = sound_samples.T[0]
+        sound_samples = sound_samples[:, 0]
 
     if not raw:
-        sound_samples = pcm2float(sound_samples, dtype='float64')
+        sound_samples = pcm2float(sound_samples, dtype=dtype)
 
     return sound_samples, sampling_rate
 
+def get_hive_name(filename):
+    """ Function for getting hive name from sound filename, as it is the first part of its folder name """
+    return filename.split(os.sep)[-2].split("_")[0]
+
+def get_sound_labels(filenames, labels):
+    """ Function for getting label (index of hive name in labels, -1 if not found) for every sound file
+
+    Parameters:
+        filenames (list(str)): sound filenames
+        labels (list(str)): label names
+
+    Returns:
+        sound_labels (np.ndarray): labels array with the same order as filenames
+    """
+    label_indices = {name: index for index, name in enumerate(labels)}
+    return np.fromiter((label_indices.get(get_hive_name(filename), -1) for filename in filenames), dtype=np.int64, count=len(filenames))
+
+def get_reading_executor():
+    """ Function for getting thread pool reading sounds in current process, pool is created once per process """
+    pid = os.getpid()
+    if pid not in _reading_executors:
+        _reading_executors[pid] = ThreadPoolExecutor(max_workers=READ_WORKERS)
+    return _reading_executors[pid]
+
+def is_stackable(sounds):
+    """ Function for checking if read sounds (samples, sampling_rate, label) can be stacked into single batch array """
+    samples, sampling_rate, _ = sounds[0]
+    return all(len(other_samples) == len(samples) and other_rate == sampling_rate for other_samples, other_rate, _ in sounds)
+
 class Sound(ABC):
     def __init__(self, filenames, labels):
         self.filenames = filenames
         self.labels = labels
+        self.sound_labels = get_sound_labels(filenames, labels)
 
     @abstractmethod
     def get_params(self):
         pass
 
-    def read_sound(self, idx, raw=False):
+    def get_frontend(self):
+        """ Function for getting frontend module calculating features from dataset items on model device,
+        None if dataset items are already features """
+        return None
+
+    def read_sound(self, idx, raw=False, dtype='float64'):
         """ Method for reading sound
         
         Parameters:
             idx: idx of sound file to be read
             raw: if sound should be in raw format (dont convert from pcm to float)
+            dtype: floating point type of converted samples
             
         Returns:
             sounds_samples (list): list of sound samples
@@ -82,11 +131,31 @@ class Sound(ABC):
             label (int): label based on index from self.labels
          """
         filename = self.filenames[idx]
-        sound_samples, sampling_rate = read_samples(filename, raw)
-        hive_name = filename.split(os.sep)[-2].split("_")[0]
-        try:
-            label = next(index for index, name in enumerate(self.labels) if name == hive_name)
-        except StopIteration as e:
-            label = -1
+        sound_samples, sampling_rate = read_samples(filename, raw, dtype)
+        label = int(self.sound_labels[idx])
 
         return sound_samples, sampling_rate, label
+
+    def read_sounds(self, indices, raw=False, dtype='float64'):
+        """ Method for reading multiple sounds concurrently (see READ_WORKERS), see read_sound
+
+        Parameters:
+            indices: indices of sound files to be read
+            raw: if sound should be in raw format (dont convert from pcm to float)
+            dtype: floating point type of converted samples
+
+        Returns:
+            sounds (list): list of (sound_samples, sampling_rate, label) tuples
+        """
+        def read(idx):
+            sound_samples, sampling_rate, label = self.read_sound(idx, raw, dtype)
+            if raw:
+                # raw samples are memory mapped, copy them so file is read by this thread
+                sound_samples = np.array(sound_samples)
+            return sound_samples, sampling_rate, label
+
+        return list(get_reading_executor().map(read, indices))
+
+    def __getitems__(self, indices):
+        """ Method for fetching whole batch (see BatchSubset), items are processed concurrently """
+        return list(get_reading_executor().map(self.__getitem__, indices))
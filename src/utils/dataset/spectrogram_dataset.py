@@ -6,9 +6,8 @@ import numpy as np
 
 from torch.utils.data import Dataset
 from scipy.io import wavfile
-from sklearn.preprocessing import MinMaxScaler
 
-from utils.data_utils import adjust_matrix, closest_power_2
+from utils.data_utils import adjust_matrix, closest_power_2, min_max_scale
 from utils.dataset.sound import Sound
 
 def calculate_spectrogram(samples, sampling_rate, nfft, hop_len, fmax=None, scale=True, db_scale=True):
@@ -44,8 +43,7 @@ def calculate_spectrogram(samples, sampling_rate, nfft, hop_len, fmax=None, scal
         spectrogram_magnitude = spectrogram_magnitude[None, :, :]         # but without indicies we should add it manually
 
     if scale:
-        initial_shape = spectrogram_magnitude.shape
-        spectrogram_magnitude = MinMaxScaler().fit_transform(spectrogram_magnitude.reshape(-1, 1)).reshape(initial_shape)
+        spectrogram_magnitude = min_max_scale(spectrogram_magnitude)
     
     spectrogram_magnitude = spectrogram_magnitude.astype(np.float32)
     return spectrogram_magnitude, frequencies, times
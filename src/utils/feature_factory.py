@@ -1,6 +1,11 @@
+import torch
 import logging
+import numpy as np
 
-from torch.utils.data import DataLoader, random_split
+from enum import Enum
+from dataclasses import dataclass, field
+from torch.utils.data import DataLoader, BatchSampler, RandomSampler, SequentialSampler
+from torch.utils.data.dataloader import default_collate
 
 from utils.dataset.periodogram_dataset import PeriodogramDataset
 from utils.dataset.spectrogram_dataset import SpectrogramDataset
@@ -8,59 +13,112 @@ from utils.dataset.mfcc_dataset import MfccDataset
 from utils.dataset.melspectrogram_dataset import MelSpectrogramDataset
 from utils.dataset.bioacustics_indicies.sound_indicies_dataset import SoundIndiciesDataset
 from utils.dataset.double_feature_dataset import DoubleFeatureDataset 
+from utils.data_utils import BatchSubset
+
+class SoundFeatureType(Enum):
+    """ Sound features supported by SoundFeatureFactory """
+    SPECTROGRAM = 'spectrogram'
+    MELSPECTROGRAM = 'melspectrogram'
+    PERIODOGRAM = 'periodogram'
+    MFCC = 'mfcc'
+    INDICIES = 'indicies'
+
+    @classmethod
+    def from_name(cls, name):
+        """ Function for getting sound feature type from its (case insensitive) name """
+        try:
+            return cls(name.lower())
+        except ValueError:
+            raise ValueError(f'{name} is not supported sound feature, should be one of {[t.value for t in cls]}')
+
+@dataclass
+class SpectrogramParams:
+    """ Spectrogram feature params, see features.spectrogram in config """
+    nfft: int = 4096
+    hop_len: int = (4096//3)+30
+    fmax: int = 2750
+
+@dataclass
+class MelSpectrogramParams:
+    """ Melspectrogram feature params, see features.melspectrogram in config """
+    nfft: int = 4096
+    hop_len: int = (4096//3)+30
+    mels: int = 64
+    on_device: bool = False
+
+@dataclass
+class PeriodogramParams:
+    """ Periodogram feature params, see features.periodogram in config """
+    slice_frequency_start: int = 0
+    slice_frequency_stop: int = 2048
+    scale_db: bool = False
+    scale: bool = True
+
+@dataclass
+class MfccParams:
+    """ MFCC feature params, see features.mfcc in config """
+    nfft: int = 4096
+    hop_len: int = (4096//3)+30
+    mels: int = 64
+
+@dataclass
+class SoundIndiciesParams:
+    """ Sound bio indicies feature params, see features.sound_indicies in config """
+    type: str = 'aci'
+    config: dict = field(default_factory=lambda: {'j_samples': 512})
 
 class SoundFeatureFactory():        
     """ Factory for data loaders """
+    @staticmethod
     def _get_spectrogram_dataset(sound_filenames, labels, features_params_dict):
         """ Function for getting spectrogram """
-        spectrogram_params = features_params_dict.get('spectrogram', {})
-        nfft = spectrogram_params.get('nfft', 4096)
-        hop_len = spectrogram_params.get('hop_len', (4096//3)+30)
-        fmax = spectrogram_params.get('fmax', 2750)
+        params = SpectrogramParams(**features_params_dict.get('spectrogram', {}))
 
-        logging.info(f'building spectrogram dataset with params: nfft({nfft}), hop_len({hop_len}), fmax({fmax})')
-        return SpectrogramDataset(sound_filenames, labels, nfft=nfft, hop_len=hop_len, fmax=fmax, truncate_power_two=True)
+        logging.info(f'building spectrogram dataset with params: {params}')
+        return SpectrogramDataset(sound_filenames, labels, nfft=params.nfft, hop_len=params.hop_len, fmax=params.fmax, truncate_power_two=True)
 
+    @staticmethod
     def _get_melspectrogram_dataset(sound_filenames, labels, features_params_dict):
         """ Function for getting melspectrogram dataset """
-        melspectrogram_params = features_params_dict.get('melspectrogram', {})
-        nfft = melspectrogram_params.get('nfft', 4096)
-        hop_len = melspectrogram_params.get('hop_len', (4096//3)+30)
-        no_mels = melspectrogram_params.get('mels', 64)
+        params = MelSpectrogramParams(**features_params_dict.get('melspectrogram', {}))
 
-        logging.info(f'building melspectrogram dataset with params: nfft({nfft}), hop_len({hop_len}), no_mels({no_mels})')
-        return MelSpectrogramDataset(sound_filenames, labels, nfft=nfft, hop_len=hop_len, mels=no_mels, truncate_power_two=True)
+        logging.info(f'building melspectrogram dataset with params: {params}')
+        return MelSpectrogramDataset(sound_filenames, labels, nfft=params.nfft, hop_len=params.hop_len, mels=params.mels, truncate_power_two=True,
+                                        on_device=params.on_device)
 
+    @staticmethod
     def _get_periodogram_dataset(sound_filenames, labels, features_params_dict):
         """ Function for getting periodogram dataset """
-        periodogram_params = features_params_dict.get('periodogram', {})
-        start_freq = periodogram_params.get('slice_frequency_start', 0)
-        stop_freq = periodogram_params.get('slice_frequency_stop', 2048)
-        db_scale = periodogram_params.get('scale_db', False)
-        should_scale = periodogram_params.get('scale', True)
+        params = PeriodogramParams(**features_params_dict.get('periodogram', {}))
 
-        logging.info(f'building periodogram dataset with params: db_scale({db_scale}), min_max_scale({should_scale}), slice_freq({(start_freq, stop_freq)})')
-        return PeriodogramDataset(sound_filenames, labels, scale_db=db_scale, scale=should_scale, slice_freq=(start_freq, stop_freq))
+        logging.info(f'building periodogram dataset with params: {params}')
+        return PeriodogramDataset(sound_filenames, labels, scale_db=params.scale_db, scale=params.scale, \
+                                    slice_freq=(params.slice_frequency_start, params.slice_frequency_stop))
 
+    @staticmethod
     def _get_mfcc_dataset(sound_filenames, labels, features_params_dict):
         """ Function for getting mfcc from sound """
-        mfcc_params = features_params_dict.get('mfcc', {})
-        nfft = mfcc_params.get('nfft', 4096)
-        hop_len = mfcc_params.get('hop_len', (4096//3)+30)
-        no_mels = mfcc_params.get('mels', 64)
+        params = MfccParams(**features_params_dict.get('mfcc', {}))
 
-        logging.info(f'building mfcc dataset with params: nfft({nfft}), hop_len({hop_len}), no_mels({no_mels})')
-        return MfccDataset(sound_filenames, labels, nfft=nfft, hop_len=hop_len, mels=no_mels)
+        logging.info(f'building mfcc dataset with params: {params}')
+        return MfccDataset(sound_filenames, labels, nfft=params.nfft, hop_len=params.hop_len, mels=params.mels)
 
+    @staticmethod
     def _get_indicies_dataset(sound_filenames, labels, features_params_dict):
         """ Function for getting indicies from sounds """
-        sound_indicies_params = features_params_dict.get('sound_indicies', {})
-        indicator_type = sound_indicies_params.get('type', 'aci')
-        config = sound_indicies_params.get('config', {'j_samples': 512})
+        params = SoundIndiciesParams(**features_params_dict.get('sound_indicies', {}))
 
-        logging.info(f'building sound bio indicies dataset with params: type({indicator_type}), config({config})')
-        return SoundIndiciesDataset(sound_filenames, labels, SoundIndiciesDataset.SoundIndicator(indicator_type), **config)
+        logging.info(f'building sound bio indicies dataset with params: {params}')
+        return SoundIndiciesDataset(sound_filenames, labels, SoundIndiciesDataset.SoundIndicator(params.type), **params.config)
 
+    # staticmethod objects are not callable before python 3.10, so underlying functions are stored
+    _DATASET_BUILDERS = {
+        SoundFeatureType.SPECTROGRAM:       _get_spectrogram_dataset.__func__,
+        SoundFeatureType.MELSPECTROGRAM:    _get_melspectrogram_dataset.__func__,
+        SoundFeatureType.PERIODOGRAM:       _get_periodogram_dataset.__func__,
+        SoundFeatureType.MFCC:              _get_mfcc_dataset.__func__,
+        SoundFeatureType.INDICIES:          _get_indicies_dataset.__func__,
+    }
 
     @classmethod
     def build_dataloaders(cls, input_type, sound_filenames, labels, features_params_dict, batch_size, ratio=0.15, num_workers=4,
@@ -68,7 +126,7 @@ class SoundFeatureFactory():
         """ Function for getting dataloaders 
         
         Parameters:
-            input_type (str): input type, should be one oof InputType Enum values
+            input_type (str): input type, should be one of SoundFeatureType Enum values
             sound_filenames (list(str)): list with sound filenames
             labels (list(str)): label names
             batch_size (int): batch size for dataloader
@@ -79,17 +137,27 @@ class SoundFeatureFactory():
             (train_loader, val_loader) (tuple(Dataloader, Dataloader)): train dataloader, validation dataloder
             feature_params (dict): dictionary with feature params
         """
-        method_name = f'_get_{input_type.lower()}_dataset'
-        function = getattr(cls, method_name, lambda: 'invalid dataset')
+        function = cls._DATASET_BUILDERS[SoundFeatureType.from_name(input_type)]
         dataset = function(sound_filenames, labels, features_params_dict)
         if background_filenames and background_labels:
             background = function(background_filenames, background_labels, features_params_dict)
             dataset = DoubleFeatureDataset(dataset, background)
 
-        val_amount = int(dataset.__len__() * ratio)
-        train_set, val_set = random_split(dataset, [(dataset.__len__() - val_amount), val_amount])
-        train_loader = DataLoader(train_set, batch_size=batch_size, shuffle=True, drop_last=True, num_workers=num_workers)
-        val_loader = DataLoader(val_set, batch_size=batch_size, shuffle=True, drop_last=True, num_workers=num_workers)
+        dataset_length = len(dataset)
+        val_amount = int(dataset_length * ratio)
+        indices = np.random.permutation(dataset_length)
+        train_set, val_set = BatchSubset(dataset, indices[val_amount:].tolist()), BatchSubset(dataset, indices[:val_amount].tolist())
+        # pinned memory allows non blocking transfers to gpu (see .to(device, non_blocking=True)) and persistent
+        # workers are not respawned every epoch, prefetching lets workers prepare batches while model is trained
+        loader_params = {'num_workers': num_workers, 'pin_memory': torch.cuda.is_available()}
+        if num_workers > 0:
+            loader_params = {**loader_params, 'persistent_workers': True, 'prefetch_factor': 4}
+        # loaders sample whole batches of indices, so datasets get them at once (see BatchSubset) and can
+        # calculate features for batch in single call, dataset items are collated into batch as usual
+        train_loader = DataLoader(train_set, sampler=BatchSampler(RandomSampler(train_set), batch_size, drop_last=True),
+                                    batch_size=None, collate_fn=default_collate, **loader_params)
+        val_loader = DataLoader(val_set, sampler=BatchSampler(SequentialSampler(val_set), batch_size, drop_last=False),
+                                    batch_size=None, collate_fn=default_collate, **loader_params)
         
         feature_params_dict = {f"FEATURE_{key}": val for key, val in dataset.get_params().items()}
 
@@ -196,8 +196,21 @@ def _model_load(model, optimizer, checkpoint_full_path, discriminator=None, disc
 
     return epoch, loss
 
+def _prepare_batch(batch, learning_params, device, frontend=None):
+    """ Function for preparing batch for model: calculating features with frontend (on device),
+    normalizing/standarizing batch and passing it to device """
+    if frontend is not None:
+        with torch.no_grad():
+            batch = frontend(batch.to(device, non_blocking=True))
+    if learning_params['batch_standarize']:
+        batch = batch_standarize(batch.cpu())
+    if learning_params['batch_normalize']:
+        batch = batch_normalize(batch.cpu())
+
+    return batch.to(device, non_blocking=True)
+
 def train_model(model, learning_params, train_loader, val_loader, discriminator=None,
-                    comet_params={}, comet_tags=[], model_output_folder="output", comet_api_key=None):
+                    comet_params={}, comet_tags=[], model_output_folder="output", comet_api_key=None, frontend=None):
     """ Main function for training model 
     
     Parameters:
@@ -210,6 +223,7 @@ def train_model(model, learning_params, train_loader, val_loader, discriminator=
         comet_tags (list): list of tags which should be uploaded to comet ml experiment
         model_output_folder (str): folder where output models will be saved
         comet_api_key (str): api key for comet ml if is None .comet.config should be available in src directory
+        frontend (nn.Module): feature frontend calculating features from raw data batches on device
 
     Returns
         model (torch.nn.Module): trained model
@@ -239,8 +253,9 @@ def train_model(model, learning_params, train_loader, val_loader, discriminator=
                                                  weight_decay=learning_params['discriminator']['weight_decay']) if discriminator else None
     # monitor training loss per batch
     train_loss = []
-    # monitor validation loss per batch
+    # monitor validation loss per batch and batch sizes, as last validation batch can be smaller
     val_loss = []
+    val_sizes = []
     # counter for patience in early sotpping
     patience_counter = 0
     # best validation score
@@ -253,6 +268,11 @@ def train_model(model, learning_params, train_loader, val_loader, discriminator=
     model.to(device)
     if discriminator is not None:
         discriminator.to(device)
+    if frontend is not None:
+        frontend.to(device)
+        if learning_params['batch_standarize'] or learning_params['batch_normalize']:
+            logging.warning('batch standarization/normalization is done on cpu, every batch calculated by feature frontend'
+                                ' will be copied from model device and back which slows training down')
 
     for epoch in range(1, learning_params['epochs'] + 1):
         ###################
@@ -267,11 +287,7 @@ def train_model(model, learning_params, train_loader, val_loader, discriminator=
             for position, batch in enumerate(concatenated_batch):
                 # as every dataset should return list (one or two elements - depends on contrastive learning or not)
                 # we should every element normalize/standarzie and pass to gpu
-                if learning_params['batch_standarize']:
-                    batch = batch_standarize(batch)
-                if learning_params['batch_normalize']:
-                    batch = batch_normalize(batch)
-                concatenated_batch[position] = batch.to(device)
+                concatenated_batch[position] = _prepare_batch(batch, learning_params, device, frontend)
 
             optimizer.zero_grad()
             output_dict = model(*concatenated_batch)
@@ -311,11 +327,7 @@ def train_model(model, learning_params, train_loader, val_loader, discriminator=
             # as every dataset should return list (one or two elements - depends on contrastive learning or not)
             # we should every element normalize/standarzie and pass to gpu
             for position, batch_val in enumerate(concatenated_val_batch):
-                if learning_params['batch_standarize']:
-                    batch_val = batch_standarize(batch_val)
-                if learning_params['batch_normalize']:
-                    batch_val = batch_normalize(batch_val)
-                concatenated_val_batch[position] = batch_val.to(device)
+                concatenated_val_batch[position] = _prepare_batch(batch_val, learning_params, device, frontend)
             
             val_output_dict = model(*concatenated_val_batch)
             if discriminator is None:
@@ -323,6 +335,7 @@ def train_model(model, learning_params, train_loader, val_loader, discriminator=
             else:
                 vloss = loss_fun(*concatenated_val_batch, val_output_dict, discriminator=discriminator, discriminator_alpha=learning_params['discriminator']['alpha'])
             val_loss.append(vloss.item())
+            val_sizes.append(len(label))
 
             # log comet ml metric
             experiment.log_metric("batch_val_loss", vloss.item(), step=step)
@@ -331,7 +344,7 @@ def train_model(model, learning_params, train_loader, val_loader, discriminator=
         # print training/validation statistics
         # calculate average loss over an epoch
         train_loss = np.average(train_loss)
-        val_loss = np.average(val_loss)
+        val_loss = np.average(val_loss, weights=val_sizes)
 
         # print avg training statistics
         logging.info(f'Epoch [{epoch}/{learning_params["epochs"]}], LOSS: {train_loss:.6f}, VAL_LOSS: {val_loss:.6f}')
@@ -354,6 +367,7 @@ def train_model(model, learning_params, train_loader, val_loader, discriminator=
         # clear batch losses
         train_loss = []
         val_loss = []
+        val_sizes = []
     
     
     epoch, _ = _model_load(model, optimizer, checkpoint_full_path, discriminator=discriminator, \